@@ -7,7 +7,7 @@ from pathlib import Path
 import json
 from intrusion_detector import IntrusionDetector
 from zone_detector import ZoneDetector
-from utils import validate_coordinates, create_download_link
+from utils import validate_coordinates, get_video_info
 def main():
     st.set_page_config(
         page_title="Intrusion Detection System",
@@ -76,19 +76,17 @@ def main():
     
     # Main content area
     if uploaded_file is not None:
-        # Create temporary file for uploaded video
-        tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
-        tfile.write(uploaded_file.read())
-        tfile.close()
+        video_bytes = uploaded_file.getvalue()
         
         # Display video info
-        cap = cv2.VideoCapture(tfile.name)
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        duration = frame_count / fps
-        cap.release()
+        video_info = probe_video(video_bytes)
+        if video_info is None:
+            st.error("Could not open the uploaded video")
+            return
+        fps = video_info['fps']
+        width = video_info['width']
+        height = video_info['height']
+        duration = video_info['duration']
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -108,19 +106,24 @@ def main():
             
             # Display zone preview
             st.subheader("Zone Preview")
-            preview_frame = np.zeros((height, width, 3), dtype=np.uint8)
-            
-            zone_detector = ZoneDetector(zone_coords, zone_type.lower())
-            zone_detector.draw_zone(preview_frame)
+            preview_png = render_preview(
+                height, width, tuple(tuple(p) for p in zone_coords), zone_type.lower()
+            )
             
-            st.image(preview_frame, caption="Restricted Zone Preview", use_column_width=True)
+            st.image(preview_png, caption="Restricted Zone Preview", use_column_width=True)
             
             # Process video button
             if st.button("🎯 Process Video", type="primary"):
-                process_video(tfile.name, zone_coords, zone_type.lower(), confidence_threshold)
-        
-        # Cleanup
-        os.unlink(tfile.name)
+                # Create temporary file for uploaded video
+                tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
+                tfile.write(video_bytes)
+                tfile.close()
+                
+                try:
+                    process_video(tfile.name, zone_coords, zone_type.lower(), confidence_threshold)
+                finally:
+                    # Cleanup
+                    os.unlink(tfile.name)
     else:
         st.info("👆 Please upload a video file to get started")
         
@@ -137,6 +140,26 @@ def main():
         - Point 3: (400, 350)
         - Point 4: (200, 350)
         """)
+@st.cache_data
+def probe_video(video_bytes):
+    """Read video metadata, cached by file contents across reruns"""
+    tfile = tempfile.NamedTemporaryFile(delete=False, suffix='.mp4')
+    try:
+        tfile.write(video_bytes)
+        tfile.close()
+        return get_video_info(tfile.name)
+    finally:
+        os.unlink(tfile.name)
+@st.cache_data
+def render_preview(height, width, zone_coords, zone_type):
+    """Draw the zone on a blank frame and return it as PNG bytes, cached by resolution and zone"""
+    preview_frame = np.zeros((height, width, 3), dtype=np.uint8)
+    
+    zone_detector = ZoneDetector(list(zone_coords), zone_type)
+    zone_detector.draw_zone(preview_frame)
+    
+    _, png = cv2.imencode('.png', preview_frame)
+    return png.tobytes()
 def process_video(video_path, zone_coords, zone_type, confidence_threshold):
     """Process video with intrusion detection"""
     
@@ -170,24 +193,23 @@ def process_video(video_path, zone_coords, zone_type, confidence_threshold):
         st.success(f"✅ Video processed successfully!")
         st.info(f"🚨 Total intrusions detected: {intrusion_count}")
         
-        # Provide download link
+        # Provide download link; the button reads the open file itself
         if os.path.exists(output_path):
             with open(output_path, "rb") as file:
                 st.download_button(
                     label="📥 Download Processed Video",
-                    data=file.read(),
+                    data=file,
                     file_name="intrusion_detection_output.mp4",
                     mime="video/mp4"
                 )
             
-            # Display first frame with detections as preview
-            cap = cv2.VideoCapture(output_path)
-            ret, frame = cap.read()
-            if ret:
+            # Display first frame with detections as preview, kept in memory
+            # by the detector so the output file doesn't need to be reopened
+            frame = detector.preview_frame
+            if frame is not None:
                 st.subheader("Preview (First Frame)")
                 frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 st.image(frame_rgb, caption="Processed Video Preview", use_column_width=True)
-            cap.release()
             
     except Exception as e:
         st.error(f"❌ Error processing video: {str(e)}")
@@ -2,9 +2,79 @@ import cv2
 import numpy as np
 import requests
 import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
 from zone_detector import ZoneDetector
+from utils import open_video_capture
+class FFmpegWriter:
+    """
+    Minimal cv2.VideoWriter replacement that pipes raw BGR frames to an
+    ffmpeg subprocess encoding with libx264
+    """
+    _available = None
+    
+    def __init__(self, output_path, fps, frame_size):
+        width, height = frame_size
+        command = [
+            'ffmpeg', '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-s', f'{width}x{height}', '-r', str(fps),
+            '-i', '-',
+            # libx264 with yuv420p needs even dimensions
+            '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+            '-c:v', 'libx264', '-preset', 'ultrafast', '-threads', '0',
+            '-pix_fmt', 'yuv420p',
+            output_path
+        ]
+        # Collect ffmpeg's errors in a file so a full pipe can't stall it
+        self.stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=self.stderr)
+    
+    @classmethod
+    def is_available(cls):
+        """Check whether an ffmpeg executable with the libx264 encoder is on the PATH"""
+        if cls._available is None:
+            cls._available = False
+            if shutil.which('ffmpeg') is not None:
+                try:
+                    result = subprocess.run(['ffmpeg', '-hide_banner', '-encoders'],
+                                            capture_output=True, text=True, timeout=10)
+                    cls._available = result.returncode == 0 and ' libx264 ' in result.stdout
+                except (OSError, subprocess.SubprocessError):
+                    pass
+        return cls._available
+    
+    def _error(self):
+        """Build an error from the exited ffmpeg process and its stderr output"""
+        self.stderr.seek(0)
+        message = self.stderr.read().decode(errors='replace').strip()
+        return RuntimeError(f"ffmpeg exited with code {self.proc.returncode}: {message}")
+    
+    def write(self, frame):
+        try:
+            self.proc.stdin.write(frame.tobytes())
+        except BrokenPipeError:
+            self.proc.wait()
+            raise self._error()
+    
+    def release(self):
+        try:
+            if self.proc.stdin:
+                self.proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        self.proc.wait()
+        try:
+            if self.proc.returncode != 0:
+                raise self._error()
+        finally:
+            self.stderr.close()
 class IntrusionDetector:
-    def __init__(self, zone_coords, zone_type, confidence_threshold=0.5):
+    def __init__(self, zone_coords, zone_type, confidence_threshold=0.5, motion_scale=0.5,
+                 detect_every_n=1, bg_method='mog2', bg_history=200, bg_mixtures=3):
         """
         Initialize the intrusion detection system
         
@@ -12,11 +82,34 @@ class IntrusionDetector:
             zone_coords: List of (x, y) tuples defining the restricted zone
             zone_type: Either 'line' or 'polygon'
             confidence_threshold: Minimum confidence for person detection
+            motion_scale: Resize factor applied to frames before motion detection
+            detect_every_n: Run detection on every Nth frame, reusing boxes in between
+            bg_method: Background subtractor to use, either 'mog2' or 'knn'
+            bg_history: Number of frames in the background model history
+            bg_mixtures: Number of Gaussian components per pixel (MOG2 only)
         """
         self.zone_detector = ZoneDetector(zone_coords, zone_type)
         self.confidence_threshold = confidence_threshold
+        self.motion_scale = motion_scale
+        self.detect_every_n = max(1, int(detect_every_n))
+        self.bg_method = bg_method.lower()
+        self.bg_history = bg_history
+        self.bg_mixtures = bg_mixtures
+        
+        # Morphology kernel and frame/mask buffers reused across frames
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+        self._small_buf = None
+        self._gray = None
+        self._fg_mask = None
+        
+        # Detections carried over to frames skipped by detect_every_n
+        self._last_boxes = np.empty((0, 5), dtype=np.float32)
+        self._last_mask = np.zeros(0, dtype=bool)
         self.intrusion_count = 0
         
+        # First annotated frame of the last processed video
+        self.preview_frame = None
+        
         # Initialize OpenCV DNN model
         self.model_loaded = False
         self.net = None
@@ -38,8 +131,18 @@ class IntrusionDetector:
         """
         Initialize motion detection-based person detection
         """
-        # Initialize background subtractor for motion detection
-        self.back_sub = cv2.createBackgroundSubtractorMOG2(detectShadows=True)
+        # Initialize background subtractor for motion detection; shadow
+        # pixels would be treated as foreground anyway, so skip detecting them.
+        # A short history and fewer mixtures keep per-pixel state small.
+        if self.bg_method == 'knn':
+            self.back_sub = cv2.createBackgroundSubtractorKNN(
+                history=self.bg_history, detectShadows=False)
+        elif self.bg_method == 'mog2':
+            self.back_sub = cv2.createBackgroundSubtractorMOG2(
+                history=self.bg_history, varThreshold=16, detectShadows=False)
+            self.back_sub.setNMixtures(self.bg_mixtures)
+        else:
+            raise ValueError("Background method must be 'mog2' or 'knn'")
         self.model_loaded = True
         print("Motion detection system initialized successfully!")
         
@@ -53,40 +156,90 @@ class IntrusionDetector:
         Returns:
             List of person bounding boxes [(x1, y1, x2, y2, confidence), ...]
         """
-        persons = []
+        return self._boxes_to_persons(self.detect_boxes(frame))
+    
+    def detect_boxes(self, frame):
+        """
+        Detect moving objects (persons) in the frame as a single array
+        
+        Args:
+            frame: Input video frame
+            
+        Returns:
+            float32 array of shape (M, 5) with rows (x1, y1, x2, y2, confidence)
+        """
+        boxes = np.empty((0, 5), dtype=np.float32)
         
         if not self.model_loaded:
-            return persons
+            return boxes
         
-        # Apply background subtraction
-        fg_mask = self.back_sub.apply(frame)
+        # Run motion detection on a downsampled copy of the frame
+        scale = self.motion_scale
+        if scale != 1.0:
+            height, width = frame.shape[:2]
+            small_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+            if self._small_buf is None or self._small_buf.shape[1::-1] != small_size:
+                self._small_buf = np.empty((small_size[1], small_size[0]) + frame.shape[2:], dtype=frame.dtype)
+            small = cv2.resize(frame, small_size, dst=self._small_buf, interpolation=cv2.INTER_AREA)
+        else:
+            small = frame
         
-        # Remove noise and fill gaps
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, kernel)
-        fg_mask = cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, kernel)
+        # Background model only needs intensity, a third of the BGR bytes
+        if small.ndim == 3:
+            if self._gray is None or self._gray.shape != small.shape[:2]:
+                self._gray = np.empty(small.shape[:2], dtype=np.uint8)
+            gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        else:
+            gray = small
         
-        # Find contours
-        contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        # Apply background subtraction into the reusable mask buffer
+        if self._fg_mask is None or self._fg_mask.shape != gray.shape:
+            self._fg_mask = np.empty(gray.shape, dtype=np.uint8)
+        fg_mask = self.back_sub.apply(gray, fgmask=self._fg_mask)
         
-        # Process contours to identify potential persons
-        for contour in contours:
-            area = cv2.contourArea(contour)
-            
-            # Filter based on area (assuming person-sized objects)
-            if area > 500 and area < 50000:  # Adjust these thresholds as needed
-                x, y, w, h = cv2.boundingRect(contour)
-                
-                # Filter based on aspect ratio (height should be greater than width for persons)
-                aspect_ratio = float(w) / h
-                if 0.2 < aspect_ratio < 1.0 and h > 50:  # Reasonable person proportions
-                    # Calculate confidence based on area and aspect ratio
-                    confidence = min(0.9, area / 5000.0)  # Normalize to 0-0.9 range
-                    
-                    if confidence >= self.confidence_threshold:
-                        persons.append((x, y, x + w, y + h, confidence))
+        # Remove noise and fill gaps in place
+        cv2.morphologyEx(fg_mask, cv2.MORPH_OPEN, self._kernel, dst=fg_mask)
+        cv2.morphologyEx(fg_mask, cv2.MORPH_CLOSE, self._kernel, dst=fg_mask)
+        
+        # Label foreground blobs; stats hold x, y, w, h, area for each label
+        _, _, stats, _ = cv2.connectedComponentsWithStats(fg_mask, connectivity=8)
+        stats = stats[1:]  # Label 0 is the background
+        
+        # Size thresholds expressed in downsampled pixels
+        area_scale = scale * scale
+        min_area = 500 * area_scale
+        max_area = 50000 * area_scale
+        min_height = 50 * scale
+        
+        xs = stats[:, cv2.CC_STAT_LEFT]
+        ys = stats[:, cv2.CC_STAT_TOP]
+        ws = stats[:, cv2.CC_STAT_WIDTH]
+        hs = stats[:, cv2.CC_STAT_HEIGHT]
+        areas = stats[:, cv2.CC_STAT_AREA]
         
-        return persons
+        # Filter based on area (assuming person-sized objects) and aspect ratio
+        # (height should be greater than width for persons)
+        aspect_ratios = ws / np.maximum(hs, 1)
+        confidences = np.minimum(0.9, areas / area_scale / 5000.0)  # Normalize to 0-0.9 range
+        keep = ((areas > min_area) & (areas < max_area) &
+                (hs > min_height) & (aspect_ratios > 0.2) & (aspect_ratios < 1.0) &
+                (confidences >= self.confidence_threshold))
+        
+        # Scale boxes back to full-resolution coordinates
+        xs, ys, ws, hs = xs[keep], ys[keep], ws[keep], hs[keep]
+        boxes = np.empty((len(xs), 5), dtype=np.float32)
+        boxes[:, 0] = (xs / scale).astype(np.int32)
+        boxes[:, 1] = (ys / scale).astype(np.int32)
+        boxes[:, 2] = ((xs + ws) / scale).astype(np.int32)
+        boxes[:, 3] = ((ys + hs) / scale).astype(np.int32)
+        boxes[:, 4] = confidences[keep]
+        
+        return boxes
+    
+    def _boxes_to_persons(self, boxes):
+        """Convert a box array to the list-of-tuples format used by the public API"""
+        return [(int(x1), int(y1), int(x2), int(y2), float(confidence))
+                for x1, y1, x2, y2, confidence in boxes.tolist()]
     
     def get_person_center(self, bbox):
         """
@@ -103,6 +256,16 @@ class IntrusionDetector:
         center_y = (y1 + y2) // 2
         return (center_x, center_y)
     
+    def get_box_centers(self, boxes):
+        """
+        Get the center points of all bounding boxes in an (M, 5) box array
+        
+        Returns:
+            int32 array of shape (M, 2) with (center_x, center_y) rows
+        """
+        corners = boxes[:, :4].astype(np.int32)
+        return (corners[:, 0:2] + corners[:, 2:4]) // 2
+    
     def draw_detections(self, frame, persons, intrusions):
         """
         Draw person detections and intrusion warnings on the frame
@@ -110,21 +273,34 @@ class IntrusionDetector:
         Args:
             frame: Input frame
             persons: List of person bounding boxes
-            intrusions: List of intrusion bounding boxes
+            intrusions: List of intrusion bounding boxes (elements of persons)
+        """
+        # Intrusions are taken directly from persons, so match by identity
+        intrusion_ids = {id(p) for p in intrusions}
+        mask = np.array([id(p) in intrusion_ids for p in persons], dtype=bool)
+        
+        boxes = np.array(persons, dtype=np.float32).reshape(-1, 5)
+        self._draw_boxes(frame, boxes, mask)
+    
+    def _draw_boxes(self, frame, boxes, intrusion_mask):
+        """
+        Draw zone, box array and intrusion warning on the frame
+        
+        Args:
+            frame: Input frame
+            boxes: float32 array of shape (M, 5) from detect_boxes
+            intrusion_mask: Boolean array of length M marking intrusions
         """
         # Draw zone boundary
         self.zone_detector.draw_zone(frame)
         
+        corners = boxes[:, :4].astype(np.int32).tolist()
+        confidences = boxes[:, 4].tolist()
+        centers = self.get_box_centers(boxes).tolist()
+        
         # Draw person detections
-        for person in persons:
-            x1, y1, x2, y2, confidence = person
-            
-            # Check if this person is in intrusion list
-            is_intrusion = any(
-                abs(x1 - ix1) < 10 and abs(y1 - iy1) < 10 
-                for ix1, iy1, ix2, iy2, _ in intrusions
-            )
-            
+        for (x1, y1, x2, y2), confidence, center, is_intrusion in zip(
+                corners, confidences, centers, intrusion_mask.tolist()):
             color = self.colors['intrusion'] if is_intrusion else self.colors['person']
             
             # Draw bounding box
@@ -139,11 +315,10 @@ class IntrusionDetector:
                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, self.colors['text'], 2)
             
             # Draw center point
-            center = self.get_person_center(person)
-            cv2.circle(frame, center, 5, color, -1)
+            cv2.circle(frame, tuple(center), 5, color, -1)
         
         # Draw intrusion warning if any intrusions detected
-        if intrusions:
+        if intrusion_mask.any():
             self.draw_intrusion_warning(frame)
     
     def draw_intrusion_warning(self, frame):
@@ -176,19 +351,23 @@ class IntrusionDetector:
         cv2.putText(frame, warning_text, (text_x, text_y), 
                    font, font_scale, self.colors['text'], thickness)
     
-    def process_video(self, input_path, output_path, progress_callback=None):
+    def process_video(self, input_path, output_path, progress_callback=None, prefetch=16):
         """
         Process entire video for intrusion detection
         
+        Decoding and encoding run on their own threads so that I/O overlaps
+        with detection; detector state is only touched from the calling thread.
+        
         Args:
             input_path: Path to input video file
             output_path: Path to output video file
             progress_callback: Optional callback function for progress updates
+            prefetch: Maximum number of frames buffered between pipeline stages
             
         Returns:
             Total number of intrusions detected
         """
-        cap = cv2.VideoCapture(input_path)
+        cap = open_video_capture(input_path)
         
         # Get video properties
         fps = int(cap.get(cv2.CAP_PROP_FPS))
@@ -196,35 +375,110 @@ class IntrusionDetector:
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
         
-        # Initialize video writer
-        fourcc = cv2.VideoWriter.fourcc(*'mp4v')
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        # Zone is static, so rasterize it once for per-point lookups
+        if width > 0 and height > 0:
+            self.zone_detector.build_zone_mask(width, height)
+        
+        # Initialize video writer, preferring ffmpeg's multi-threaded x264;
+        # ffmpeg rejects a zero frame rate, so keep OpenCV's writer for those
+        if fps > 0 and FFmpegWriter.is_available():
+            out = FFmpegWriter(output_path, fps, (width, height))
+        else:
+            fourcc = cv2.VideoWriter.fourcc(*'mp4v')
+            out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
+        
+        # Bounded queues between reader -> main -> writer; None marks EOF
+        read_q = queue.Queue(maxsize=prefetch)
+        write_q = queue.Queue(maxsize=prefetch)
+        stop = threading.Event()
+        
+        def put(q, item):
+            # Give up if the pipeline is being torn down
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def reader():
+            try:
+                while cap.isOpened() and not stop.is_set():
+                    ret, frame = cap.read()
+                    if not ret:
+                        break
+                    if not put(read_q, frame):
+                        return
+            finally:
+                put(read_q, None)
+        
+        # Exceptions raised on the writer thread, re-raised by the caller
+        writer_errors = []
+        
+        def writer():
+            try:
+                while True:
+                    frame = write_q.get()
+                    if frame is None:
+                        break
+                    out.write(frame)
+            except Exception as e:
+                writer_errors.append(e)
+        
+        def put_frame(item):
+            # Give up if the writer thread has exited
+            while writer_thread.is_alive():
+                try:
+                    write_q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        reader_thread = threading.Thread(target=reader, daemon=True)
+        writer_thread = threading.Thread(target=writer, daemon=True)
+        reader_thread.start()
+        writer_thread.start()
         
         frame_count = 0
         total_intrusions = 0
+        self.preview_frame = None
+        self._last_boxes = np.empty((0, 5), dtype=np.float32)
+        self._last_mask = np.zeros(0, dtype=bool)
         
         try:
             while True:
-                ret, frame = cap.read()
-                if not ret:
+                frame = read_q.get()
+                if frame is None:
                     break
                 
-                # Detect persons in current frame
-                persons = self.detect_persons(frame)
+                if frame_count % self.detect_every_n == 0:
+                    # Detect persons in current frame
+                    boxes = self.detect_boxes(frame)
+                    
+                    # Check for intrusions
+                    mask = self.zone_detector.points_in_zone(self.get_box_centers(boxes))
+                    
+                    self._last_boxes = boxes
+                    self._last_mask = mask
+                else:
+                    # Reuse the most recent detections on skipped frames
+                    boxes = self._last_boxes
+                    mask = self._last_mask
                 
-                # Check for intrusions
-                intrusions = []
-                for person in persons:
-                    center = self.get_person_center(person)
-                    if self.zone_detector.is_point_in_zone(center):
-                        intrusions.append(person)
-                        total_intrusions += 1
+                total_intrusions += int(mask.sum())
                 
                 # Draw detections and warnings
-                self.draw_detections(frame, persons, intrusions)
+                self._draw_boxes(frame, boxes, mask)
                 
-                # Write frame to output video
-                out.write(frame)
+                # Keep the first annotated frame for previews
+                if self.preview_frame is None:
+                    self.preview_frame = frame
+                
+                # Hand frame off to the writer thread
+                if not put_frame(frame):
+                    break
                 
                 frame_count += 1
                 
@@ -234,7 +488,18 @@ class IntrusionDetector:
                     progress_callback(progress)
         
         finally:
+            stop.set()
+            reader_thread.join()
+            put_frame(None)
+            writer_thread.join()
             cap.release()
-            out.release()
+            try:
+                out.release()
+            except Exception as e:
+                # Report encoder failures after any error from the writer thread
+                writer_errors.append(e)
+        
+        if writer_errors:
+            raise writer_errors[0]
         
         return total_intrusions
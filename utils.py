@@ -1,5 +1,3 @@
-mport base64
-import os
 import numpy as np
 import cv2
 def validate_coordinates(zone_coords, frame_width, frame_height):
@@ -20,39 +18,60 @@ def validate_coordinates(zone_coords, frame_width, frame_height):
     if len(zone_coords) < 2:
         return False, "At least 2 coordinates required"
     
-    for i, (x, y) in enumerate(zone_coords):
-        if not isinstance(x, (int, float)) or not isinstance(y, (int, float)):
-            return False, f"Point {i+1}: Coordinates must be numeric"
-        
-        if x < 0 or x >= frame_width:
+    try:
+        arr = np.asarray(zone_coords)
+    except ValueError:
+        return False, "Coordinates must be (x, y) pairs"
+    
+    if arr.ndim != 2 or arr.shape[1] != 2:
+        return False, "Coordinates must be (x, y) pairs"
+    
+    # Anything other than a numeric dtype means some value isn't a number
+    if arr.dtype.kind not in 'biuf':
+        for i, (x, y) in enumerate(zone_coords):
+            if not isinstance(x, (int, float, np.number)) or not isinstance(y, (int, float, np.number)):
+                return False, f"Point {i+1}: Coordinates must be numeric"
+    arr = arr.astype(np.float64)
+    
+    # Bounds check all points at once, then report the first offender
+    bad_x = (arr[:, 0] < 0) | (arr[:, 0] >= frame_width)
+    bad_y = (arr[:, 1] < 0) | (arr[:, 1] >= frame_height)
+    bad = bad_x | bad_y
+    
+    if bad.any():
+        i = int(np.argmax(bad))
+        x, y = zone_coords[i]
+        if bad_x[i]:
             return False, f"Point {i+1}: X coordinate {x} is outside frame width (0-{frame_width-1})"
-        
-        if y < 0 or y >= frame_height:
-            return False, f"Point {i+1}: Y coordinate {y} is outside frame height (0-{frame_height-1})"
+        return False, f"Point {i+1}: Y coordinate {y} is outside frame height (0-{frame_height-1})"
     
     return True, "Valid coordinates"
-def create_download_link(file_path, link_text="Download File"):
+def open_video_capture(video_path):
     """
-    Create a download link for a file
+    Open a video with the FFmpeg backend and hardware-accelerated decoding
+    
+    Falls back to the default backend when hardware acceleration is not
+    supported by the installed OpenCV build (requires OpenCV >= 4.5.2).
     
     Args:
-        file_path: Path to the file
-        link_text: Text to display for the link
+        video_path: Path to video file
         
     Returns:
-        HTML string for download link
+        cv2.VideoCapture object
     """
-    if not os.path.exists(file_path):
-        return "File not found"
-    
-    with open(file_path, "rb") as f:
-        data = f.read()
-    
-    b64 = base64.b64encode(data).decode()
-    filename = os.path.basename(file_path)
-    
-    href = f'<a href="data:application/octet-stream;base64,{b64}" download="{filename}">{link_text}</a>'
-    return href
+    if hasattr(cv2, 'CAP_PROP_HW_ACCELERATION'):
+        # Let OpenCV pick the device; an explicit CAP_PROP_HW_DEVICE is
+        # rejected in combination with VIDEO_ACCELERATION_ANY
+        params = [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+        try:
+            cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, params)
+            if cap.isOpened():
+                return cap
+            cap.release()
+        except cv2.error:
+            pass
+    
+    return cv2.VideoCapture(video_path)
 def get_video_info(video_path):
     """
     Get basic information about a video file
@@ -63,7 +82,7 @@ def get_video_info(video_path):
     Returns:
         Dictionary with video information
     """
-    cap = cv2.VideoCapture(video_path)
+    cap = open_video_capture(video_path)
     
     if not cap.isOpened():
         return None
@@ -2,6 +2,53 @@ import cv2
 import numpy as np
 from shapely.geometry import Point, Polygon, LineString
 from shapely.ops import nearest_points
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+def _pip(poly, x, y):
+    """Ray casting point-in-polygon test on an (N, 2) float64 vertex array"""
+    n = poly.shape[0]
+    inside = False
+    
+    p1x, p1y = poly[0, 0], poly[0, 1]
+    for i in range(1, n + 1):
+        p2x, p2y = poly[i % n, 0], poly[i % n, 1]
+        if y > min(p1y, p2y):
+            if y <= max(p1y, p2y):
+                if x <= max(p1x, p2x):
+                    if p1y != p2y:
+                        xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+                    else:
+                        xinters = p1x
+                    if p1x == p2x or x <= xinters:
+                        inside = not inside
+        p1x, p1y = p2x, p2y
+    
+    return inside
+if NUMBA_AVAILABLE:
+    _pip = njit(cache=True)(_pip)
+def _pip_many(poly, points):
+    """Ray casting test of (M, 2) points against an (N, 2) vertex array, vectorized over points"""
+    x = points[:, 0]
+    y = points[:, 1]
+    inside = np.zeros(len(points), dtype=bool)
+    
+    n = poly.shape[0]
+    for i in range(n):
+        p1x, p1y = poly[i]
+        p2x, p2y = poly[(i + 1) % n]
+        crosses = (y > min(p1y, p2y)) & (y <= max(p1y, p2y)) & (x <= max(p1x, p2x))
+        if p1x != p2x:
+            if p1y != p2y:
+                xinters = (y - p1y) * (p2x - p1x) / (p2y - p1y) + p1x
+            else:
+                xinters = p1x
+            crosses &= x <= xinters
+        inside ^= crosses
+    
+    return inside
 class ZoneDetector:
     def __init__(self, zone_coords, zone_type):
         """
@@ -19,14 +66,69 @@ class ZoneDetector:
             if len(zone_coords) < 2:
                 raise ValueError("Line zone requires at least 2 points")
             self.zone_geometry = LineString(zone_coords)
-            # For line crossing detection, we'll use a buffer
-            self.zone_buffer = self.zone_geometry.buffer(20)  # 20 pixel buffer
         elif self.zone_type == 'polygon':
             if len(zone_coords) < 3:
                 raise ValueError("Polygon zone requires at least 3 points")
             self.zone_geometry = Polygon(zone_coords)
         else:
             raise ValueError("Zone type must be 'line' or 'polygon'")
+        
+        # Vertex array used by the JIT point-in-polygon test
+        if self.zone_type == 'line':
+            self._poly = self._line_buffer_polygon(20)
+        else:
+            self._poly = np.asarray(zone_coords, dtype=np.float64)
+        
+        # Rasterized zone, built once the frame size is known
+        self._zone_mask = None
+        
+        # Cached polygon overlay cropped to the zone bounding box
+        self._overlay_shape = None
+        self._overlay_rect = None
+        
+        # Contour for OpenCV's point test when Numba isn't installed
+        self._np_poly = self._poly.astype(np.float32).reshape(-1, 1, 2)
+        
+        # Warm up the JIT so the first frame isn't slow
+        if NUMBA_AVAILABLE:
+            _pip(self._poly, 0.0, 0.0)
+    
+    def _line_buffer_polygon(self, distance):
+        """
+        Build the vertex array of the buffered region around a line zone
+        
+        A two-point line becomes the rectangle offset by distance on either
+        side of the segment, without the round end caps of a shapely buffer;
+        polylines fall back to the shapely buffer outline.
+        
+        Args:
+            distance: Buffer distance in pixels
+            
+        Returns:
+            (N, 2) float64 array of polygon vertices
+        """
+        if len(self.zone_coords) == 2:
+            p1, p2 = np.asarray(self.zone_coords, dtype=np.float64)
+            direction = p2 - p1
+            length = np.hypot(direction[0], direction[1])
+            if length > 0:
+                normal = np.array([-direction[1], direction[0]]) / length * distance
+                return np.array([p1 + normal, p2 + normal, p2 - normal, p1 - normal])
+        
+        zone_buffer = self.zone_geometry.buffer(distance)
+        return np.asarray(zone_buffer.exterior.coords, dtype=np.float64)
+    
+    def build_zone_mask(self, width, height):
+        """
+        Rasterize the zone into a boolean image so points can be tested by lookup
+        
+        Args:
+            width: Width of video frame
+            height: Height of video frame
+        """
+        mask = np.zeros((height, width), dtype=np.uint8)
+        cv2.fillPoly(mask, [np.round(self._poly).astype(np.int32)], 1)
+        self._zone_mask = mask.view(np.bool_)
     
     def is_point_in_zone(self, point):
         """
@@ -38,13 +140,43 @@ class ZoneDetector:
         Returns:
             Boolean indicating if point is in zone
         """
-        shapely_point = Point(point)
+        if self._zone_mask is not None:
+            x, y = int(point[0]), int(point[1])
+            height, width = self._zone_mask.shape
+            if 0 <= x < width and 0 <= y < height:
+                return bool(self._zone_mask[y, x])
+            return False
         
-        if self.zone_type == 'line':
-            # For line zones, check if point is within buffer distance
-            return self.zone_buffer.contains(shapely_point)
-        else:  # polygon
-            return self.zone_geometry.contains(shapely_point)
+        # Line zones are tested against their precomputed buffer rectangle
+        x, y = float(point[0]), float(point[1])
+        if NUMBA_AVAILABLE:
+            return _pip(self._poly, x, y)
+        return cv2.pointPolygonTest(self._np_poly, (x, y), False) >= 0
+    
+    def points_in_zone(self, points):
+        """
+        Check which of several points are inside the restricted zone
+        
+        Args:
+            points: Array-like of shape (M, 2) with (x, y) points to check
+            
+        Returns:
+            Boolean mask of length M indicating which points are in zone
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(points) == 0:
+            return np.zeros(0, dtype=bool)
+        
+        if self._zone_mask is not None:
+            xs = points[:, 0].astype(np.intp)
+            ys = points[:, 1].astype(np.intp)
+            height, width = self._zone_mask.shape
+            inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+            result = np.zeros(len(points), dtype=bool)
+            result[inside] = self._zone_mask[ys[inside], xs[inside]]
+            return result
+        
+        return _pip_many(self._poly, points)
     
     def get_distance_to_zone(self, point):
         """
@@ -91,10 +223,15 @@ class ZoneDetector:
             points = np.array(self.zone_coords, dtype=np.int32)
             cv2.polylines(frame, [points], True, color, thickness)
             
-            # Fill polygon with semi-transparent overlay
-            overlay = frame.copy()
-            cv2.fillPoly(overlay, [points], color)
-            cv2.addWeighted(frame, 0.8, overlay, 0.2, 0, frame)
+            # Fill polygon with semi-transparent overlay, blending only the
+            # zone bounding box in place
+            if self._overlay_shape != frame.shape:
+                self._build_overlay(frame.shape, points, color)
+            if self._overlay_rect is not None:
+                x0, y0, x1, y1 = self._overlay_rect
+                roi = frame[y0:y1, x0:x1]
+                cv2.addWeighted(roi, 0.8, self._zone_overlay_roi, 0.2, 0, dst=self._blend_roi)
+                np.copyto(roi, self._blend_roi, where=self._alpha_mask)
             
             # Draw corner points
             for point in self.zone_coords:
@@ -108,6 +245,35 @@ class ZoneDetector:
                 cv2.putText(frame, "RESTRICTED ZONE", (centroid_x - 80, centroid_y),
                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
     
+    def _build_overlay(self, frame_shape, points, color):
+        """
+        Precompute the polygon fill overlay for frames of the given shape
+        
+        Args:
+            frame_shape: Shape of the BGR frames the zone is drawn on
+            points: (N, 2) int32 array of polygon vertices
+            color: BGR fill color
+        """
+        self._overlay_shape = frame_shape
+        self._overlay_rect = None
+        
+        height, width = frame_shape[:2]
+        x, y, w, h = cv2.boundingRect(points)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, width), min(y + h, height)
+        if x0 >= x1 or y0 >= y1:
+            return
+        
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.fillPoly(mask, [points - np.array([x0, y0], dtype=np.int32)], 1)
+        
+        roi_shape = (y1 - y0, x1 - x0, 3)
+        self._zone_overlay_roi = np.empty(roi_shape, dtype=np.uint8)
+        self._zone_overlay_roi[:] = color
+        self._blend_roi = np.empty(roi_shape, dtype=np.uint8)
+        self._alpha_mask = mask.view(np.bool_)[:, :, None]
+        self._overlay_rect = (x0, y0, x1, y1)
+    
     def is_crossing_line(self, prev_point, curr_point):
         """
         Check if movement from prev_point to curr_point crosses the line zone